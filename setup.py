@@ -27,9 +27,9 @@ setuptools.setup(
         'goto': ['shell/*']
     },
     install_requires=[
-        'toml', 'click', 'pathlib2'
+        'tomli ; python_version < "3.11"', 'tomli-w', 'click'
     ],
-    python_requires='>=2.7.6,!=3.0.*,!=3.1.*,!=3.2.*',
+    python_requires='>=3.7',
     classifiers=[
         "Development Status :: 4 - Beta",
         "Environment :: Console",
@@ -37,7 +37,6 @@ setuptools.setup(
         "License :: OSI Approved :: MIT License",
         "Operating System :: Unix",
         "Programming Language :: Python :: 3",
-        "Programming Language :: Python :: 2",
         "Topic :: System :: Shells"
     ]
 )
@@ -46,16 +46,18 @@ def do_rmprofile(profile):
     If the profile is the active profile, changes to the default profile.
 
     '''
-    if profile == storage.get_active_profile_name():
-        storage.set_active_profile('default')
-    storage.remove_profile(profile)
+    with storage.transaction():
+        if profile == storage.get_active_profile_name():
+            storage.set_active_profile('default')
+        storage.remove_profile(profile)
 
 
 def do_profile(profile):
     '''Sets the current profile to `profile`. Throws on error.'''
-    if profile not in storage.list_profiles():
-        storage.add_profile(profile)
-    storage.set_active_profile(profile)
+    with storage.transaction():
+        if profile not in storage.list_profiles():
+            storage.add_profile(profile)
+        storage.set_active_profile(profile)
 
 def do_profiles():
     '''Returns a tuple of (currently active profile, all profiles)'''
@@ -231,23 +233,28 @@ BASH_ZSH = click.Choice(['bash', 'zsh'])
 def main(configuration, **kwargs):
     '''CLI for teleporting to anywhere on your computer!'''
     try:
-        has_prefix = kwargs['prefix'] is not None
-        has_profile = kwargs['profile'] is not None
-        has_rm = kwargs['rmprofile']
-        util.cond(
-            (kwargs['add'], lambda: handle_add(kwargs['add'])),
-            (kwargs['get'], lambda: handle_get(kwargs['get'])),
-            (has_prefix, lambda: handle_prefix(kwargs['prefix'])),
-            (kwargs['remove'], lambda: handle_remove(kwargs['remove'])),
-            (kwargs['list'], handle_list),
-            (has_rm, lambda: handle_rmprofile(kwargs['rmprofile'])),
-            (has_profile, lambda: handle_profile(kwargs['profile'])),
-            (kwargs['profiles'], handle_profiles),
-            (kwargs['install'], lambda: handle_install(kwargs['install'])),
-            (kwargs['config'], lambda: handle_config(kwargs['config'],
-                                                    configuration)),
-            (True, print_help)
-        )()
+        if kwargs['add']:
+            handle_add(kwargs['add'])
+        elif kwargs['get']:
+            handle_get(kwargs['get'])
+        elif kwargs['prefix'] is not None:
+            handle_prefix(kwargs['prefix'])
+        elif kwargs['remove']:
+            handle_remove(kwargs['remove'])
+        elif kwargs['list']:
+            handle_list()
+        elif kwargs['rmprofile']:
+            handle_rmprofile(kwargs['rmprofile'])
+        elif kwargs['profile'] is not None:
+            handle_profile(kwargs['profile'])
+        elif kwargs['profiles']:
+            handle_profiles()
+        elif kwargs['install']:
+            handle_install(kwargs['install'])
+        elif kwargs['config']:
+            handle_config(kwargs['config'], configuration)
+        else:
+            print_help()
     except storage.StorageException as exception:
         util.error(str(exception))
         exit(1)
@@ -1,101 +1,286 @@
 '''Storage functions for accessing configuration.'''
+import bisect
+import contextlib
+import copy
+import functools
 import os
 import os.path
-import toml
-try:
-    from pathlib import Path
-except ImportError:
-    from pathlib2 import Path
-from . import util
 
 ALLOWED_SETTING_KEYS = set(['test_key', 'example_key'])
 
+_HOME = os.path.expanduser('~')
+_CONFIG_HOME_CACHE = {}
+_SETTINGS_CACHE = {}
+_PROFILE_FILES = {}
+_PROFILES_SET = [None, None]
+_SORTED_TELEPORTS = [None, None]
+_TRANSACTION = None
+
 class StorageException(Exception):
     '''Exception with the storage engine of goto.'''
 
 
+_TOML_READER = None
+
+def _toml_reader():
+    '''Returns the TOML parser module, imported on first use.'''
+    global _TOML_READER
+    if _TOML_READER is None:
+        try:
+            import tomllib
+        except ImportError:
+            import tomli as tomllib
+        _TOML_READER = tomllib
+    return _TOML_READER
+
+
+def _toml_writer():
+    '''Returns the TOML writer module, imported on first use.'''
+    import tomli_w
+    return tomli_w
+
+
+def _reset_config_home_cache():
+    '''Clears the config home cache. Used by tests that change the home.'''
+    _CONFIG_HOME_CACHE.clear()
+
+
+def _reset_home_cache():
+    '''Re-reads the user's home directory. Used by tests that change it.'''
+    global _HOME
+    _HOME = os.path.expanduser('~')
+
+
+def _reset_caches():
+    '''Clears every in-memory cache. Used by tests that change the home.'''
+    _reset_config_home_cache()
+    _reset_home_cache()
+    _SETTINGS_CACHE.clear()
+    _PROFILE_FILES.clear()
+    _PROFILES_SET[0] = None
+    _PROFILES_SET[1] = None
+    _SORTED_TELEPORTS[0] = None
+    _SORTED_TELEPORTS[1] = None
+    _config_path.cache_clear()
+
+
+def _profile_name_set(data):
+    '''Returns the profile names as a set for O(1) membership checks.
+
+    The set is cached against the identity of the profiles list, so
+    repeated mutations of the same settings dict (e.g. inside a
+    transaction) reuse it instead of rebuilding it per operation.
+
+    '''
+    profiles = data['profiles']
+    if _PROFILES_SET[0] is not profiles:
+        _PROFILES_SET[0] = profiles
+        _PROFILES_SET[1] = set(profiles)
+    return _PROFILES_SET[1]
+
+
+def _profile_files(home):
+    '''Returns the set of config file names in home, scanned once.'''
+    if home not in _PROFILE_FILES:
+        with os.scandir(home) as entries:
+            _PROFILE_FILES[home] = set(
+                entry.name for entry in entries if entry.name.endswith('.toml')
+            )
+    return _PROFILE_FILES[home]
+
+
+@functools.lru_cache(maxsize=64)
+def _config_path(home, fname):
+    '''Returns the path of a config file, caching the joined string.'''
+    return os.path.join(home, fname)
+
+
+def _settings_path():
+    '''Returns the path of the settings file.'''
+    return _config_path(get_config_home(), '_setting.toml')
+
+
+def _profile_path(name):
+    '''Returns the path of the named profile's file.'''
+    return _config_path(get_config_home(), f'{name}.toml')
+
+
 def get_config_home():
-    '''Returns the home folder of the configurations.'''
-    xdg_home = os.environ.get('XDG_CONFIG_HOME')
-    dot_config = os.path.join(os.path.expanduser('~'), '.config')
-    dot_goto = os.path.join(os.path.expanduser('~'), '.goto-cd')
+    '''Returns the home folder of the configurations.
 
-    join = os.path.join
-    home_path = util.cond(
-        (xdg_home, lambda: join(xdg_home, 'goto-cd')),
-        (Path(dot_config).exists(), lambda: join(dot_config, 'goto-cd')),
-        (True, dot_goto)
-    )()
+    The resolved (and created) path is cached per environment, so repeated
+    calls cost a dict lookup instead of stat/mkdir syscalls.
+
+    '''
+    xdg_home = os.environ.get('XDG_CONFIG_HOME')
+    cache_key = (xdg_home, _HOME)
+    if cache_key in _CONFIG_HOME_CACHE:
+        return _CONFIG_HOME_CACHE[cache_key]
+
+    if xdg_home:
+        home_path = os.path.join(xdg_home, 'goto-cd')
+    else:
+        dot_config = os.path.join(_HOME, '.config')
+        if os.path.isdir(dot_config):
+            home_path = os.path.join(dot_config, 'goto-cd')
+        else:
+            home_path = os.path.join(_HOME, '.goto-cd')
 
     touch_directory(home_path)
+    _CONFIG_HOME_CACHE[cache_key] = home_path
     return home_path
 
 
 def touch_directory(dirpath):
     '''Makes sure the whole directory path exists.'''
-    Path(dirpath).mkdir(exist_ok=True)
-
-
-def _touch_config_file(fpath):
-    '''Makes sure the file exists.'''
-    with open(fpath, 'a') as _:
-        pass
+    os.makedirs(dirpath, exist_ok=True)
 
 
 def _remove_file(name):
     '''Helper for removing file from configuration home.'''
-    home = get_config_home()
-    fpath = os.path.join(home, '{}.toml'.format(name))
+    fpath = _profile_path(name)
+    dirpath, fname = os.path.split(fpath)
+    files = _PROFILE_FILES.get(dirpath)
+    if files is not None:
+        files.discard(fname)
     if os.path.exists(fpath):
         os.remove(fpath)
 
-def _retrieve_config(fname):
-    '''Retrieves a config file, if it does not exist, creates it.'''
-    touch_directory(get_config_home())
-    fpath = os.path.join(get_config_home(), fname)
-    _touch_config_file(fpath)
-    return fpath
-
 
 def _read_config_file(fpath):
-    '''Reads the content of a file and returns it.'''
-    with open(fpath, 'r') as fhandle:
-        return toml.load(fhandle)
+    '''Reads the content of a file and returns it.
+
+    The file is slurped in one read and parsed from memory, so the
+    parser never issues small incremental reads against the disk.
+
+    '''
+    with open(fpath, 'rb') as fhandle:
+        return _toml_reader().loads(fhandle.read().decode('utf-8'))
 
 
 def write_file(fpath, data):
-    '''Writes the data to file.'''
-    with open(fpath, 'w') as fhandle:
-        toml.dump(data, fhandle)
+    '''Writes the data to file atomically.
+
+    The serialized TOML is written to a sibling tmp file in a single
+    write and moved over the target with os.replace, so a crash mid-way
+    can never leave a half-written config file behind.
+
+    '''
+    _SETTINGS_CACHE.pop(fpath, None)
+    tmp_path = f'{fpath}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as fhandle:
+        fhandle.write(_toml_writer().dumps(data))
+    os.replace(tmp_path, fpath)
+    dirpath, fname = os.path.split(fpath)
+    files = _PROFILE_FILES.get(dirpath)
+    if files is not None and fname.endswith('.toml'):
+        files.add(fname)
+
+
+def _cache_settings(fpath, data):
+    '''Caches the settings alongside the file's current mtime.'''
+    _SETTINGS_CACHE[fpath] = (os.stat(fpath).st_mtime_ns, copy.deepcopy(data))
 
 
 def _update_settings(data):
-    '''Updates the settings with new data.'''
-    fname = '_setting.toml'
-    home = get_config_home()
-    fpath = os.path.join(home, fname)
+    '''Updates the settings with new data.
+
+    Inside a transaction the write is deferred until the transaction
+    exits; otherwise the data is written through immediately.
+
+    '''
+    if _TRANSACTION is not None:
+        _TRANSACTION[0] = data
+        _TRANSACTION[1] = True
+        return
+    fpath = _settings_path()
     write_file(fpath, data)
+    _cache_settings(fpath, data)
+
+
+def _read_modify_write_settings(modify):
+    '''Applies modify to the settings with a single open of the file.
+
+    The settings file is opened once in r+b mode; the content is parsed,
+    modify mutates the dict in place, and the same handle is truncated
+    and rewritten. If modify raises, nothing is written. Inside a
+    transaction the shared dict is mutated and the write stays deferred.
+
+    '''
+    if _TRANSACTION is not None:
+        modify(_TRANSACTION[0])
+        _TRANSACTION[1] = True
+        return
+    fpath = _settings_path()
+    try:
+        fhandle = open(fpath, 'r+b')
+    except FileNotFoundError:
+        data = _get_settings()
+        modify(data)
+        _update_settings(data)
+        return
+    with fhandle:
+        data = _toml_reader().loads(fhandle.read().decode('utf-8'))
+        modify(data)
+        fhandle.seek(0)
+        fhandle.truncate()
+        fhandle.write(_toml_writer().dumps(data).encode('utf-8'))
+    _cache_settings(fpath, data)
+
+
+@contextlib.contextmanager
+def transaction():
+    '''Batches several settings mutations into one read and one write.
+
+    While the transaction is open, settings accessors share a single
+    in-memory dict; the settings file is written once on exit (and not
+    at all if the body raises).
+
+    '''
+    global _TRANSACTION
+    if _TRANSACTION is not None:
+        yield
+        return
+    _TRANSACTION = [_get_settings(), False]
+    try:
+        yield
+        data, dirty = _TRANSACTION
+    finally:
+        _TRANSACTION = None
+    if dirty:
+        _update_settings(data)
 
 
 def _write_default_file():
     '''Writes default data to default.toml'''
-    home = get_config_home()
-    fpath = os.path.join(home, 'default.toml')
-    write_file(fpath, {})
+    write_file(_profile_path('default'), {})
 
 def _get_settings():
-    '''Returns the configuration settings.'''
-    fname = '_setting.toml'
-    home = get_config_home()
-    fpath = os.path.join(home, fname)
-    if not Path(fpath).exists():
+    '''Returns the configuration settings.
+
+    The parsed settings are cached in memory and only re-read when the
+    file's mtime changes, so repeated calls skip the open and TOML parse.
+
+    '''
+    if _TRANSACTION is not None:
+        return _TRANSACTION[0]
+    fpath = _settings_path()
+    try:
+        mtime = os.stat(fpath).st_mtime_ns
+    except FileNotFoundError:
         default_values = {
             'current_profile': 'default',
             'profiles': ['default']
         }
         _update_settings(default_values)
         _write_default_file()
-    return _read_config_file(fpath)
+        return default_values
+    cached = _SETTINGS_CACHE.get(fpath)
+    if cached and cached[0] == mtime:
+        return copy.deepcopy(cached[1])
+    data = _read_config_file(fpath)
+    _cache_settings(fpath, data)
+    return data
 
 
 def list_profiles():
@@ -104,33 +289,44 @@ def list_profiles():
     return data.get('profiles', [])
 
 
-def add_profile(name):
-    '''Adds a profile.'''
-    data = _get_settings()
-    if name in data['profiles']:
-        msg = '{} is a profile that already exists'.format(name)
+def _validate_profile_name(name, data):
+    '''Validates that name is usable for a new profile.'''
+    if not name:
+        raise StorageException('You must provide a profile name')
+    if name[0] == '_':
+        msg = f'{name} - you cannot start profiles with "_"'
         raise StorageException(msg)
-    if name.startswith('_'):
-        msg = '{} - you cannot start profiles with "_"'.format(name)
+    if name in _profile_name_set(data):
+        msg = f'{name} is a profile that already exists'
         raise StorageException(msg)
 
-    data['profiles'].append(name)
-    _update_settings(data)
-    fpath = os.path.join(get_config_home(), '{}.toml'.format(name))
-    write_file(fpath, {})
+
+def add_profile(name):
+    '''Adds a profile.'''
+    def modify(data):
+        '''Validates the new profile name and inserts it in order.'''
+        _validate_profile_name(name, data)
+        bisect.insort(data['profiles'], name)
+        _profile_name_set(data).add(name)
+
+    _read_modify_write_settings(modify)
+    write_file(_profile_path(name), {})
 
 
 def remove_profile(name):
     '''Removes a profile.'''
-    data = _get_settings()
-    if name not in data['profiles']:
-        msg = '{} - not a profile that exists'.format(name)
-        raise StorageException(msg)
-    if name == 'default':
-        msg = 'You cannot remove the default profile'
-        raise StorageException(msg)
-    data['profiles'].remove(name)
-    _update_settings(data)
+    def modify(data):
+        '''Validates that the profile can be removed and drops it.'''
+        if name not in _profile_name_set(data):
+            msg = f'{name} - not a profile that exists'
+            raise StorageException(msg)
+        if name == 'default':
+            msg = 'You cannot remove the default profile'
+            raise StorageException(msg)
+        data['profiles'].remove(name)
+        _profile_name_set(data).discard(name)
+
+    _read_modify_write_settings(modify)
     _remove_file(name)
 
 def get_active_profile_name():
@@ -141,12 +337,14 @@ def get_active_profile_name():
 
 def set_active_profile(name):
     '''Sets the current profile.'''
-    data = _get_settings()
-    if name not in data['profiles']:
-        msg = 'Error: {} is not a profile that exists'.format(name)
-        raise StorageException(msg)
-    data['current_profile'] = name
-    _update_settings(data)
+    def modify(data):
+        '''Validates that the profile exists and makes it current.'''
+        if name not in _profile_name_set(data):
+            msg = f'Error: {name} is not a profile that exists'
+            raise StorageException(msg)
+        data['current_profile'] = name
+
+    _read_modify_write_settings(modify)
 
 
 def get_default_profile():
@@ -161,20 +359,23 @@ def update_default_profile(data):
 
 def update_named_profile(name, data):
     '''Updates the values in a named profile.'''
-    config_path = os.path.join(get_config_home(), '{}.toml'.format(name))
-    write_file(config_path, data)
+    write_file(_profile_path(name), data)
 
 
 def get_named_profile(name, public_file=True):
     '''Returns the data of the specified profile.'''
-    if public_file and name.startswith('_'):
-        msg = 'Error: {} is an invalid name. Cannot start with "_"'.format(name)
+    if public_file and name[:1] == '_':
+        msg = f'Error: {name} is an invalid name. Cannot start with "_"'
         raise StorageException(msg)
 
-    fpath = _retrieve_config('{}.toml'.format(name))
+    home = get_config_home()
+    fname = f'{name}.toml'
+    fpath = _config_path(home, fname)
+    if fname not in _profile_files(home):
+        write_file(fpath, {})
+        return {}
     try:
-        data = _read_config_file(fpath)
-        return data
+        return _read_config_file(fpath)
     except IOError:
         write_file(fpath, {})
         return {}
@@ -191,12 +392,12 @@ def update_active_profile(data):
 
 def set_teleport(name, target):
     '''Sets a (new) teleport path for the currently active profile.'''
-    path = Path(os.path.expanduser(target))
-    if not path.is_dir():
-        raise StorageException('{} is not a directory'.format(target))
+    expanded = os.path.expanduser(target)
+    if not os.path.isdir(expanded):
+        raise StorageException(f'{target} is not a directory')
     if not name:
         raise StorageException('You must provide a name')
-    target = str(path.resolve())
+    target = os.path.realpath(expanded)
     data = get_active_profile()
     data[name] = target
     update_active_profile(data)
@@ -205,7 +406,7 @@ def remove_teleport(name):
     '''Removes a teleport from the currently active profile.'''
     data = get_active_profile()
     if not data.get(name):
-        msg = '{} is not a location you can teleport to'.format(name)
+        msg = f'{name} is not a location you can teleport to'
         raise StorageException(msg)
     del data[name]
     update_active_profile(data)
@@ -221,15 +422,40 @@ def get_teleport_target(name):
     '''Return a teleport target that matches name or throw an error.'''
     data = get_active_profile()
     if name not in data:
-        msg = '{} is not a valid teleport'.format(name)
+        msg = f'{name} is not a valid teleport'
         raise StorageException(msg)
     return data[name]
 
 
+def _sorted_teleport_names():
+    '''Returns the active profile's teleport names in sorted order.
+
+    The sorted list is memoized against the unsorted names, so repeated
+    completion queries only re-sort when the teleports actually change.
+
+    '''
+    names = list_teleports()
+    if _SORTED_TELEPORTS[0] != names:
+        _SORTED_TELEPORTS[0] = names
+        _SORTED_TELEPORTS[1] = sorted(names)
+    return _SORTED_TELEPORTS[1]
+
+
 def get_matching_teleports(prefix):
-    '''Returns all teleports matching the prefix.'''
-    teleports = list_teleports()
-    return [T + os.sep for T in teleports if T.startswith(prefix)]
+    '''Returns all teleports matching the prefix.
+
+    The teleport names are scanned in sorted order starting from the
+    bisection point of the prefix, so only actual matches are compared
+    instead of every teleport.
+
+    '''
+    names = _sorted_teleport_names()
+    index = bisect.bisect_left(names, prefix)
+    matches = []
+    while index < len(names) and names[index].startswith(prefix):
+        matches.append(names[index] + os.sep)
+        index += 1
+    return matches
 
 
 def starts_with_teleport(fpath):
@@ -246,7 +472,7 @@ def prefix_can_be_determined(prefix):
 def expand_teleport_path(teleport_path):
     '''Expands the teleport at beginning of a teleport path and normalizes.'''
     if not starts_with_teleport(teleport_path):
-        msg = '"{}" does not start with a teleport'.format(teleport_path)
+        msg = f'"{teleport_path}" does not start with a teleport'
         raise StorageException(msg)
     elements = teleport_path.split(os.sep)
 
@@ -254,7 +480,7 @@ def expand_teleport_path(teleport_path):
     joined = os.sep.join(elements)
     ends_with_sep = joined.endswith(os.sep)
     if not ends_with_sep and os.path.isdir(joined):
-        return '{}{}'.format(joined, os.sep)
+        return f'{joined}{os.sep}'
     return joined
 
 
@@ -306,25 +532,27 @@ def get_prefix_expansions(prefix):
 def set_config(attr, value):
     '''sets attr to value'''
     if attr not in ALLOWED_SETTING_KEYS:
-        msg = '"{}" is an invalid key for the config'.format(attr)
+        msg = f'"{attr}" is an invalid key for the config'
         raise StorageException(msg)
-    data = _get_settings()
-    data[attr] = value
-    _update_settings(data)
+    def modify(data):
+        '''Stores the value under attr.'''
+        data[attr] = value
+    _read_modify_write_settings(modify)
 
 def get_config(attr):
     '''gets the value of attr from config file'''
     data = _get_settings()
     if attr not in data:
-        msg = '{} is not set'.format(attr)
+        msg = f'{attr} is not set'
         raise StorageException(msg)
     return data[attr]
 
 def remove_config(attr):
     '''removes attr from config file'''
-    data = _get_settings()
-    if attr not in data:
-        msg = '{} is not set'.format(attr)
-        raise StorageException(msg)
-    del data[attr]
-    _update_settings(data)
+    def modify(data):
+        '''Validates that attr is set and removes it.'''
+        if attr not in data:
+            msg = f'{attr} is not set'
+            raise StorageException(msg)
+        del data[attr]
+    _read_modify_write_settings(modify)
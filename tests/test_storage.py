@@ -139,6 +139,26 @@ def test_remove_default_throws():
     with pytest.raises(goto.storage.StorageException):
         goto.storage.remove_profile('default')
 
+@test_util.custom_home
+def test_transaction_batches_mutations():
+    '''Test that mutations inside a transaction are visible afterwards.'''
+    with goto.storage.transaction():
+        goto.storage.add_profile('abcd')
+        goto.storage.set_active_profile('abcd')
+    assert set(goto.storage.list_profiles()) == set(['default', 'abcd'])
+    assert goto.storage.get_active_profile_name() == 'abcd'
+
+
+@test_util.custom_home
+def test_transaction_discards_on_error():
+    '''Test that a failing transaction leaves the settings untouched.'''
+    with pytest.raises(goto.storage.StorageException):
+        with goto.storage.transaction():
+            goto.storage.add_profile('abcd')
+            goto.storage.set_active_profile('nonexistant')
+    assert goto.storage.list_profiles() == ['default']
+
+
 @test_util.custom_home
 def test_get_active_profile():
     '''Test getting the active profile.'''
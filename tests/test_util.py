@@ -3,14 +3,18 @@ import tempfile
 import shutil
 import decorator
 
+import goto
+
 @decorator.decorator
 def custom_home(func, *args, **kwargs):
     '''Use a custom home for most operations.'''
     try:
         os.environ['XDG_CONFIG_HOME'] = tempfile.mkdtemp(prefix='gotocd')
+        goto.storage._reset_caches()
         func(*args, **kwargs)
     finally:
         shutil.rmtree(os.environ['XDG_CONFIG_HOME'])
+        goto.storage._reset_caches()
 
 
 def home_path(fpath):